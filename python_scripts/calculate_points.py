@@ -5,9 +5,16 @@ import sys
 import logging
 from collections import defaultdict
 from datetime import datetime
+from heapq import nlargest
 from dataclasses import dataclass
+from operator import itemgetter
 from typing import Dict, List, Optional, Any
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library
+    orjson = None
+
 # --- Constants ---
 TDF_YEAR = 2025
 
@@ -31,8 +38,20 @@ SCORING_RULES_JERSEY = {
     "polka_dot_jersey": 10,
     "white_jersey": 10
 }
+# Same jersey points keyed by jersey type as used in jersey_holders (e.g. "yellow")
+JERSEY_POINTS_BY_TYPE = {
+    jersey_key.removesuffix("_jersey"): points for jersey_key, points in SCORING_RULES_JERSEY.items()
+}
 SCORING_RULES_COMBATIVE = 5
 
+# Stage data field holding each jersey's wearer, keyed by jersey type
+JERSEY_SOURCE_FIELDS = {
+    "yellow": "top_gc_rider",
+    "green": "top_points_rider",
+    "polka_dot": "top_kom_rider",
+    "white": "top_youth_rider"
+}
+
 SCORING_RULES_RANK = {rank: 21 - rank for rank in range(2, 21)}  # 19 points for 2nd, down to 1 point for 20th
 SCORING_RULES_RANK[1] = 25
 
@@ -78,24 +97,49 @@ class LeaderboardEntry:
 def load_json_data(filepath: str, default_value=None):
     """Load JSON data from a file, or return default_value if file does not exist."""
     if os.path.exists(filepath):
+        if orjson is not None:
+            with open(filepath, 'rb') as f:
+                return orjson.loads(f.read())
         with open(filepath, 'r', encoding='utf-8') as f:
             return json.load(f)
     return default_value
 
 def save_json_data(data, filepath: str):
-    """Save data as JSON to a file, creating directories as needed."""
+    """Save data as JSON to a file, creating directories as needed.
+
+    Files whose content would not change are left untouched; otherwise the file is
+    replaced atomically so readers never see a partially written file.
+    """
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        # OPT_INDENT_2 matches json.dump(indent=2, ensure_ascii=False) byte for byte
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+    if os.path.exists(filepath):
+        with open(filepath, 'rb') as f:
+            if f.read() == payload:
+                logging.info(f"{filepath} is unchanged, skipping write.")
+                return
+
+    tmp_filepath = f"{filepath}.tmp"
+    with open(tmp_filepath, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_filepath, filepath)
 
 def find_available_scraped_stages(stage_data_dir: str) -> List[int]:
     """Return a sorted list of available scraped stage numbers."""
     stage_numbers = []
     if os.path.exists(stage_data_dir):
-        for filename in os.listdir(stage_data_dir):
-            match = re.match(r'stage_(\d+)\.json', filename)
-            if match:
-                stage_numbers.append(int(match.group(1)))
+        with os.scandir(stage_data_dir) as entries:
+            for entry in entries:
+                # Filenames have the fixed shape 'stage_<N>.json'; slicing avoids a regex per entry
+                filename = entry.name
+                if filename.startswith('stage_') and filename.endswith('.json') and entry.is_file():
+                    stage_number = filename[6:-5]
+                    if stage_number.isdecimal():
+                        stage_numbers.append(int(stage_number))
     return sorted(set(stage_numbers))
 
 def load_scraped_stage_data(stage_number: int, stage_data_dir: str):
@@ -124,22 +168,20 @@ def safe_int_conversion(value: Any) -> int:
 
 def calculate_rider_stage_points(stage_results: List[dict], jersey_holders: Dict[str, str]) -> Dict[str, dict]:
     """Calculate points breakdown for each rider in a stage."""
-    rider_data = defaultdict(lambda: {
-        "stage_finish_points": 0,
-        "stage_finish_position": 0,
-        "jersey_points": {},
-        "stage_total": 0
-    })
-
-    # Stage Finish Points
+    rider_data = {}
+
+    # Stage Finish Points (jerseys are applied afterwards, so each finisher starts from a fresh entry)
     for row in stage_results:
         rider = row['rider_name']        
         rank = safe_int_conversion(row['rank'])
         points = get_stage_points_for_rank(rank)
         if rank > 0:
-            rider_data[rider]["stage_finish_points"] = points
-            rider_data[rider]["stage_finish_position"] = rank
-            rider_data[rider]["stage_total"] = points
+            rider_data[rider] = {
+                "stage_finish_points": points,
+                "stage_finish_position": rank,
+                "jersey_points": {},
+                "stage_total": points
+            }
 
     # Jersey points & combative rider points
     for jersey_type, holder_data in jersey_holders.items():
@@ -167,16 +209,23 @@ def calculate_rider_stage_points(stage_results: List[dict], jersey_holders: Dict
             point_category = "combative"
         else:
             # For yellow, green, polka_dot, white jerseys
-            points_key = f"{jersey_type}_jersey"
-            points = SCORING_RULES_JERSEY.get(points_key, 0)
+            points = JERSEY_POINTS_BY_TYPE.get(jersey_type, 0)
             point_category = jersey_type 
 
         # 3. Apply Points to Rider
         if points > 0:
-            rider_data[holder_name]["jersey_points"][point_category] = points
-            rider_data[holder_name]["stage_total"] += points
+            holder_entry = rider_data.get(holder_name)
+            if holder_entry is None:
+                holder_entry = rider_data[holder_name] = {
+                    "stage_finish_points": 0,
+                    "stage_finish_position": 0,
+                    "jersey_points": {},
+                    "stage_total": 0
+                }
+            holder_entry["jersey_points"][point_category] = points
+            holder_entry["stage_total"] += points
 
-    return dict(rider_data)
+    return rider_data
 
 
 # --- Data Processing ---
@@ -186,12 +235,15 @@ class TDFDataProcessor:
         self.riders_data = {}
         self.stages_data = {}
         self.leaderboard_by_stage = {}
+        self.overall_ranks_by_stage = {}
         self.directie_leaderboard_by_stage = {}
         self.cumulative_rider_points = defaultdict(int)
         self.cumulative_participant_points = defaultdict(int)
         self.cumulative_directie_points = defaultdict(int)
         self.participant_directie_contributions = defaultdict(lambda: defaultdict(int))
         self.participant_to_directie = {}
+        # Fallback date for stages without one, formatted once per run
+        self.run_date = datetime.now().strftime("%Y-%m-%d")
 
         # Build participant → directie mapping from stage 0
         initial_stage = self.team_selections_per_stage.get(0, [])
@@ -203,22 +255,20 @@ class TDFDataProcessor:
         
     def process_stage(self, stage_num: int, stage_raw_data: dict):
         """Process a single stage and update all data structures."""
-        stage_date = stage_raw_data.get('stage_info', {}).get('date', datetime.now().strftime("%Y-%m-%d"))
-        
+        stage_key = f'stage_{stage_num}'
+
         # Extract stage info
         stage_info = stage_raw_data.get('stage_info', {})
+        stage_date = stage_info.get('date', self.run_date)
         stage_results = stage_raw_data.get('top_20_finishers', [])
         
         # Extract jersey holders
         jersey_holders = {}
-        if stage_raw_data.get('top_gc_rider', {}).get('rider_name'):
-            jersey_holders['yellow'] = stage_raw_data['top_gc_rider']['rider_name']
-        if stage_raw_data.get('top_points_rider', {}).get('rider_name'):
-            jersey_holders['green'] = stage_raw_data['top_points_rider']['rider_name']
-        if stage_raw_data.get('top_kom_rider', {}).get('rider_name'):
-            jersey_holders['polka_dot'] = stage_raw_data['top_kom_rider']['rider_name']
-        if stage_raw_data.get('top_youth_rider', {}).get('rider_name'):
-            jersey_holders['white'] = stage_raw_data['top_youth_rider']['rider_name']
+        for jersey_type, source_field in JERSEY_SOURCE_FIELDS.items():
+            # Scraped stages store None when a classification is missing
+            holder_name = (stage_raw_data.get(source_field) or {}).get('rider_name')
+            if holder_name:
+                jersey_holders[jersey_type] = holder_name
         
         # Combative rider - handle null, dict, or string
         combative_data = stage_raw_data.get('combative_rider')
@@ -231,7 +281,7 @@ class TDFDataProcessor:
                 jersey_holders['combative_rider'] = combative_data
 
         winner = stage_results[0]['rider_name'] if stage_results else None
-        self.stages_data[f'stage_{stage_num}'] = {
+        self.stages_data[stage_key] = {
             'info': stage_info,
             'winner': winner,
             'jerseys': jersey_holders,
@@ -247,7 +297,7 @@ class TDFDataProcessor:
             if rider_name not in self.riders_data:
                 self.riders_data[rider_name] = {'total_points': 0, 'stages': {}}
             self.cumulative_rider_points[rider_name] += stage_data['stage_total']
-            self.riders_data[rider_name]['stages'][f'stage_{stage_num}'] = {
+            self.riders_data[rider_name]['stages'][stage_key] = {
                 'date': stage_date,
                 'stage_finish_points': stage_data['stage_finish_points'],
                 'stage_finish_position': int(stage_data.get('stage_finish_position', 0)), 
@@ -257,23 +307,28 @@ class TDFDataProcessor:
             }
             self.riders_data[rider_name]['total_points'] = self.cumulative_rider_points[rider_name]
 
-        # Ensure all riders have entry
-        for rider_name in self.cumulative_rider_points.keys():
-            if rider_name not in rider_stage_points:
-                if rider_name not in self.riders_data:
-                    self.riders_data[rider_name] = {'total_points': 0, 'stages': {}}
-                self.riders_data[rider_name]['stages'][f'stage_{stage_num}'] = {
-                    'date': stage_date,
-                    'stage_finish_points': 0,
-                    'stage_finish_position': 0,
-                    'jersey_points': {},
-                    'stage_total': 0,
-                    'cumulative_total': self.cumulative_rider_points[rider_name]
-                }
+        # Ensure all riders have entry (only riders that did not score this stage need a zero entry)
+        zero_entry = {
+            'date': stage_date,
+            'stage_finish_points': 0,
+            'stage_finish_position': 0,
+            'jersey_points': {},
+            'stage_total': 0,
+            'cumulative_total': 0
+        }
+        for rider_name in self.cumulative_rider_points.keys() - rider_stage_points.keys():
+            rider_entry = self.riders_data.setdefault(rider_name, {'total_points': 0, 'stages': {}})
+            # Shallow copy of the stage template; jersey_points gets its own dict
+            entry = zero_entry.copy()
+            entry['jersey_points'] = {}
+            entry['cumulative_total'] = self.cumulative_rider_points[rider_name]
+            rider_entry['stages'][stage_key] = entry
 
         # Participant scores
         participant_roster_list = self.team_selections_per_stage.get(stage_num, [])
         participant_stage_scores = {}
+        # Flat rider -> stage points map; riders missing here scored nothing this stage
+        rider_stage_totals = {rider: data['stage_total'] for rider, data in rider_stage_points.items()}
         for selection_entry in participant_roster_list:
             participant_name = selection_entry.get("name")
             if not participant_name:
@@ -283,8 +338,7 @@ class TDFDataProcessor:
             stage_score = 0
             rider_contributions = {}
             for rider in selected_riders:
-                rider_data_stage = self.riders_data.get(rider, {}).get('stages', {}).get(f'stage_{stage_num}', {})
-                rider_points = rider_data_stage.get('stage_total', 0)
+                rider_points = rider_stage_totals.get(rider, 0)
                 stage_score += rider_points
                 rider_contributions[rider] = rider_points
             directie = self.participant_to_directie.get(participant_name, "Unknown")
@@ -302,6 +356,7 @@ class TDFDataProcessor:
 
     # --- Leaderboard updates (same as original) ---
     def update_leaderboard_after_stage(self, stage_num: int, participant_stage_scores: dict):
+        stage_key = f'stage_{stage_num}'
         leaderboard = []
         for participant_name, score in self.cumulative_participant_points.items():
             stage_data = participant_stage_scores.get(participant_name, {})
@@ -314,18 +369,19 @@ class TDFDataProcessor:
             })
 
         # Overall ranking
-        leaderboard.sort(key=lambda x: x['overall_score'], reverse=True)
-        previous_stage_key = f'stage_{stage_num - 1}'
-        previous_leaderboard = self.leaderboard_by_stage.get(previous_stage_key, [])
-        previous_ranks = {entry['participant_name']: entry['overall_rank'] for entry in previous_leaderboard}
+        leaderboard.sort(key=itemgetter('overall_score'), reverse=True)
+        previous_ranks = self.overall_ranks_by_stage.get(f'stage_{stage_num - 1}', {})
+        overall_ranks = {}
         for i, entry in enumerate(leaderboard):
             overall_rank = i + 1
             entry['overall_rank'] = overall_rank
+            overall_ranks[entry['participant_name']] = overall_rank
             prev_rank = previous_ranks.get(entry['participant_name'])
             entry['overall_rank_change'] = prev_rank - overall_rank if prev_rank is not None else 0
+        self.overall_ranks_by_stage[stage_key] = overall_ranks
 
         # Stage ranking
-        stage_ranking = sorted(leaderboard, key=lambda x: x['stage_score'], reverse=True)
+        stage_ranking = sorted(leaderboard, key=itemgetter('stage_score'), reverse=True)
         stage_ranks = {entry['participant_name']: i + 1 for i, entry in enumerate(stage_ranking)}
         for entry in leaderboard:
             entry['stage_rank'] = stage_ranks[entry['participant_name']]
@@ -343,7 +399,7 @@ class TDFDataProcessor:
                 'stage_rider_contributions': e['stage_rider_contributions']
             } for e in leaderboard
         ]
-        self.leaderboard_by_stage[f'stage_{stage_num}'] = ordered_leaderboard
+        self.leaderboard_by_stage[stage_key] = ordered_leaderboard
 
     def update_directie_leaderboard_after_stage(self, stage_num: int, participant_stage_scores: dict):
         directie_participants_stage = defaultdict(list)
@@ -357,14 +413,14 @@ class TDFDataProcessor:
 
         directie_leaderboard = []
         for directie, participants in directie_participants_stage.items():
-            top_n = sorted(participants, key=lambda x: x['stage_contribution'], reverse=True)[:TOP_N_PARTICIPANTS_FOR_DIRECTIE]
+            top_n = nlargest(TOP_N_PARTICIPANTS_FOR_DIRECTIE, participants, key=itemgetter('stage_contribution'))
             stage_total = sum(p['stage_contribution'] for p in top_n)
             self.cumulative_directie_points[directie] += stage_total
             overall_contributions = [
                 {'participant_name': p, 'overall_score': self.participant_directie_contributions[directie][p]}
                 for p in self.participant_directie_contributions[directie].keys()
             ]
-            overall_contributions.sort(key=lambda x: x['overall_score'], reverse=True)
+            overall_contributions.sort(key=itemgetter('overall_score'), reverse=True)
             stage_contributions = [{'participant_name': p['participant_name'], 'stage_score': p['stage_contribution']} for p in top_n]
             directie_leaderboard.append({
                 'directie_name': directie,
@@ -375,7 +431,7 @@ class TDFDataProcessor:
             })
 
         # Rankings
-        directie_leaderboard.sort(key=lambda x: x['overall_score'], reverse=True)
+        directie_leaderboard.sort(key=itemgetter('overall_score'), reverse=True)
         previous_stage_key = f'stage_{stage_num - 1}'
         previous_directie_leaderboard = self.directie_leaderboard_by_stage.get(previous_stage_key, [])
         previous_directie_ranks = {e['directie_name']: e['overall_rank'] for e in previous_directie_leaderboard}
@@ -383,7 +439,7 @@ class TDFDataProcessor:
             entry['overall_rank'] = i + 1
             prev_rank = previous_directie_ranks.get(entry['directie_name'])
             entry['overall_rank_change'] = prev_rank - entry['overall_rank'] if prev_rank is not None else 0
-        stage_ranking = sorted(directie_leaderboard, key=lambda x: x['stage_score'], reverse=True)
+        stage_ranking = sorted(directie_leaderboard, key=itemgetter('stage_score'), reverse=True)
         stage_ranks = {e['directie_name']: i + 1 for i, e in enumerate(stage_ranking)}
         for entry in directie_leaderboard:
             entry['stage_rank'] = stage_ranks[entry['directie_name']]
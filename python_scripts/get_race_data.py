@@ -2,6 +2,7 @@ import json
 import os
 from procyclingstats import Stage
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Directory and File Naming Configuration ---
 DATA_DIR = 'data'
@@ -10,7 +11,29 @@ STAGE_DATA_DIR = os.path.join(DATA_DIR, 'stage_results')
 # Set the stage number for the desired Tour de France stage
 current_stage_number = 12  # Set this to the latest stage you want to scrape
 
-# --- Helper function to reformat rider names ---
+# Number of stages scraped concurrently (kept small to stay polite to procyclingstats)
+MAX_SCRAPE_WORKERS = 4
+
+# Mapping of procyclingstats profile icons to stage difficulty labels
+STAGE_DIFFICULTY_MAP = {
+    'p0': 'N/A',
+    'p1': 'Flat',
+    'p2': 'Hills, flat finish',
+    'p3': 'Hills, uphill finish',
+    'p4': 'Mountains, flat finish',
+    'p5': 'Mountains, uphill finish'
+}
+
+# Lowercase surname prefixes (e.g. 'van der Poel'), built once instead of per name
+SURNAME_PREFIXES = frozenset({'van', 'der', 'de', 'den', 'le', 'dos', 'da', 'di', 'del', 'la'})
+
+# --- Helper functions to reformat rider names ---
+def _proper_case_part(part):
+    lower_part = part.lower()
+    if lower_part in SURNAME_PREFIXES:
+        return lower_part
+    return part.title()
+
 def reformat_rider_name(name_str):
     """
     Attempts to reformat a rider name from 'LastName FirstName' to 'FirstName LastName'.
@@ -27,13 +50,6 @@ def reformat_rider_name(name_str):
     # and decode back, effectively removing diacritics.
     normalized_name_str = unicodedata.normalize('NFKD', name_str).encode('ascii', 'ignore').decode('utf-8')
     parts = normalized_name_str.strip().split(' ')
-    surname_prefixes = {'van', 'der', 'de', 'den', 'le', 'dos', 'da', 'di', 'del', 'la'}
-
-    def _proper_case_part(part):
-        lower_part = part.lower()
-        if lower_part in surname_prefixes:
-            return lower_part
-        return part.title()
 
     if len(parts) < 2:
         return _proper_case_part(parts[0]) if parts else ""
@@ -49,7 +65,7 @@ def reformat_rider_name(name_str):
         # Find the longest sequence of surname prefixes at the start
         i = 0
         prefix_sequence = []
-        while i < len(parts) - 1 and parts[i].lower() in surname_prefixes:
+        while i < len(parts) - 1 and parts[i].lower() in SURNAME_PREFIXES:
             prefix_sequence.append(_proper_case_part(parts[i]))
             i += 1
         if prefix_sequence:
@@ -61,7 +77,7 @@ def reformat_rider_name(name_str):
     if len(parts) >= 3:
         i = len(parts) - 1
         prefix_sequence = []
-        while i > 0 and parts[i].lower() in surname_prefixes:
+        while i > 0 and parts[i].lower() in SURNAME_PREFIXES:
             prefix_sequence.insert(0, _proper_case_part(parts[i]))
             i -= 1
         if prefix_sequence:
@@ -78,127 +94,130 @@ def reformat_rider_name(name_str):
 
     return f"{first_name} {last_name}"
 
-def scrape_all_stages(up_to_stage):
-    os.makedirs(STAGE_DATA_DIR, exist_ok=True)
-    print(f"Ensured output directory exists: {STAGE_DATA_DIR}")
-    for stage_number in range(1, up_to_stage + 1):
-        stage_url = f"race/tour-de-france/2025/stage-{stage_number}/result"
-        filename = f"stage_{stage_number}.json"
-        filepath = os.path.join(STAGE_DATA_DIR, filename)
+def scrape_stage(stage_number):
+    """Scrapes a single stage from procyclingstats and saves the extracted data to STAGE_DATA_DIR."""
+    stage_url = f"race/tour-de-france/2025/stage-{stage_number}/result"
+    filename = f"stage_{stage_number}.json"
+    filepath = os.path.join(STAGE_DATA_DIR, filename)
+    try:
+        print(f"Scraping stage {stage_number}...")
+        stage = Stage(stage_url)
+        full_stage_data = stage.parse()
+        extracted_data = {}
+        stage_info = {}
+        stage_info['date'] = full_stage_data.get('date', 'N/A')
+        stage_info['distance'] = full_stage_data.get('distance', 'N/A')
+        stage_info['departure_city'] = full_stage_data.get('departure', 'N/A')
+        stage_info['arrival_city'] = full_stage_data.get('arrival', 'N/A')
+        stage_info['stage_type_category'] = full_stage_data.get('stage_type', 'N/A')
         try:
-            print(f"Scraping stage {stage_number}...")
-            stage = Stage(stage_url)
-            full_stage_data = stage.parse()
-            extracted_data = {}
-            stage_info = {}
-            stage_info['date'] = full_stage_data.get('date', 'N/A')
-            stage_info['distance'] = full_stage_data.get('distance', 'N/A')
-            stage_info['departure_city'] = full_stage_data.get('departure', 'N/A')
-            stage_info['arrival_city'] = full_stage_data.get('arrival', 'N/A')
-            stage_info['stage_type_category'] = full_stage_data.get('stage_type', 'N/A')
-            try:
-                profile_icon_value = stage.profile_icon()
-                difficulty_map = {
-                    'p0': 'N/A',
-                    'p1': 'Flat',
-                    'p2': 'Hills, flat finish',
-                    'p3': 'Hills, uphill finish',
-                    'p4': 'Mountains, flat finish',
-                    'p5': 'Mountains, uphill finish'
-                }
-                stage_info['stage_difficulty'] = difficulty_map.get(profile_icon_value, 'Unknown')
-            except Exception as e:
-                stage_info['stage_difficulty'] = 'N/A'
-                print(f"Warning: Could not get stage profile icon for stage {stage_number}: {e}")
-            stage_info['won_how'] = full_stage_data.get('won_how', 'N/A')
-            extracted_data['stage_info'] = stage_info
-            
-            # Initialize combined DNF list and list for all finished riders
-            extracted_data['dnf_riders'] = []
-            all_finished_riders = []
-
-            if 'results' in full_stage_data and isinstance(full_stage_data['results'], list):
-                for rider in full_stage_data['results']:
-                    rider_status = rider.get("status")
-                    rider_name_formatted = reformat_rider_name(rider.get("rider_name"))
-                    
-                    if rider_status in ['DNF', 'DNS', 'OTL', 'DSQ']:
-                        dnf_entry = {
-                            "rider_name": rider_name_formatted,
-                            "team_name": rider.get("team_name", "N/A"),
-                            "rider_number": rider.get("rider_number", "N/A"),
-                            "status": rider_status
-                        }
-                        extracted_data['dnf_riders'].append(dnf_entry)
-                    else: # Assuming 'DF' or other finishing status
-                        finished_rider_entry = {
-                            "rider_name": rider_name_formatted,
-                            "rank": rider.get("rank"),
-                            "time": rider.get("time"),
-                            "team": rider.get("team", "N/A"),
-                            "rider_number": rider.get("rider_number", "N/A")
-                        }
-                        all_finished_riders.append(finished_rider_entry)
-
-                # Your existing top 20 logic, now using the filtered all_finished_riders
-                extracted_data['top_20_finishers'] = all_finished_riders[:20]
+            profile_icon_value = stage.profile_icon()
+            stage_info['stage_difficulty'] = STAGE_DIFFICULTY_MAP.get(profile_icon_value, 'Unknown')
+        except Exception as e:
+            stage_info['stage_difficulty'] = 'N/A'
+            print(f"Warning: Could not get stage profile icon for stage {stage_number}: {e}")
+        stage_info['won_how'] = full_stage_data.get('won_how', 'N/A')
+        extracted_data['stage_info'] = stage_info
+        
+        # Initialize combined DNF list and list for all finished riders
+        extracted_data['dnf_riders'] = []
+        all_finished_riders = []
+
+        if 'results' in full_stage_data and isinstance(full_stage_data['results'], list):
+            for rider in full_stage_data['results']:
+                rider_status = rider.get("status")
+                rider_name_formatted = reformat_rider_name(rider.get("rider_name"))
                 
-            else:
-                extracted_data['top_20_finishers'] = []
-                print(f"Warning: 'results' not found or not a list in the parsed data for stage {stage_number}.")
-            
-            # Continue with your existing top rider extractions for classifications
-            def extract_top_rider_info(rider_data):
-                if rider_data:
-                    name_to_format = rider_data.get("rider_name") if isinstance(rider_data, dict) else rider_data
-                    return {
-                        "rider_name": reformat_rider_name(name_to_format),
-                        "rank": rider_data.get("rank") if isinstance(rider_data, dict) else None
+                if rider_status in ['DNF', 'DNS', 'OTL', 'DSQ']:
+                    dnf_entry = {
+                        "rider_name": rider_name_formatted,
+                        "team_name": rider.get("team_name", "N/A"),
+                        "rider_number": rider.get("rider_number", "N/A"),
+                        "status": rider_status
+                    }
+                    extracted_data['dnf_riders'].append(dnf_entry)
+                else: # Assuming 'DF' or other finishing status
+                    finished_rider_entry = {
+                        "rider_name": rider_name_formatted,
+                        "rank": rider.get("rank"),
+                        "time": rider.get("time"),
+                        "team": rider.get("team", "N/A"),
+                        "rider_number": rider.get("rider_number", "N/A")
                     }
-                return None
+                    all_finished_riders.append(finished_rider_entry)
+
+            # Your existing top 20 logic, now using the filtered all_finished_riders
+            extracted_data['top_20_finishers'] = all_finished_riders[:20]
             
-            if 'gc' in full_stage_data and isinstance(full_stage_data['gc'], list) and full_stage_data['gc']:
-                extracted_data['top_gc_rider'] = extract_top_rider_info(full_stage_data['gc'][0])
-            else:
-                extracted_data['top_gc_rider'] = None
-                print(f"Warning: 'gc' data not found or empty for stage {stage_number}.")
-            if 'kom' in full_stage_data and isinstance(full_stage_data['kom'], list) and full_stage_data['kom']:
-                extracted_data['top_kom_rider'] = extract_top_rider_info(full_stage_data['kom'][0])
-            else:
-                extracted_data['top_kom_rider'] = None
-                print(f"Warning: 'kom' data not found or empty for stage {stage_number}.")
-            if 'points' in full_stage_data and isinstance(full_stage_data['points'], list) and full_stage_data['points']:
-                extracted_data['top_points_rider'] = extract_top_rider_info(full_stage_data['points'][0])
-            else:
-                extracted_data['top_points_rider'] = None
-                print(f"Warning: 'points' data not found or empty for stage {stage_number}.")
-            if 'youth' in full_stage_data and isinstance(full_stage_data['youth'], list) and full_stage_data['youth']:
-                extracted_data['top_youth_rider'] = extract_top_rider_info(full_stage_data['youth'][0])
-            else:
-                extracted_data['top_youth_rider'] = None
-                print(f"Warning: 'youth' data not found or empty for stage {stage_number}.")
-            if 'combative_rider' in full_stage_data and full_stage_data['combative_rider']:
-                combative_rider_data = full_stage_data['combative_rider']
-                if isinstance(combative_rider_data, dict):
-                    name_to_format = combative_rider_data.get('rider_name')
-                    rank = combative_rider_data.get('rank', 1)
-                else:
-                    name_to_format = combative_rider_data
-                    rank = 1
-                extracted_data['combative_rider'] = {
+        else:
+            extracted_data['top_20_finishers'] = []
+            print(f"Warning: 'results' not found or not a list in the parsed data for stage {stage_number}.")
+        
+        # Continue with your existing top rider extractions for classifications
+        def extract_top_rider_info(rider_data):
+            if rider_data:
+                name_to_format = rider_data.get("rider_name") if isinstance(rider_data, dict) else rider_data
+                return {
                     "rider_name": reformat_rider_name(name_to_format),
-                    "rank": rank
+                    "rank": rider_data.get("rank") if isinstance(rider_data, dict) else None
                 }
+            return None
+        
+        if 'gc' in full_stage_data and isinstance(full_stage_data['gc'], list) and full_stage_data['gc']:
+            extracted_data['top_gc_rider'] = extract_top_rider_info(full_stage_data['gc'][0])
+        else:
+            extracted_data['top_gc_rider'] = None
+            print(f"Warning: 'gc' data not found or empty for stage {stage_number}.")
+        if 'kom' in full_stage_data and isinstance(full_stage_data['kom'], list) and full_stage_data['kom']:
+            extracted_data['top_kom_rider'] = extract_top_rider_info(full_stage_data['kom'][0])
+        else:
+            extracted_data['top_kom_rider'] = None
+            print(f"Warning: 'kom' data not found or empty for stage {stage_number}.")
+        if 'points' in full_stage_data and isinstance(full_stage_data['points'], list) and full_stage_data['points']:
+            extracted_data['top_points_rider'] = extract_top_rider_info(full_stage_data['points'][0])
+        else:
+            extracted_data['top_points_rider'] = None
+            print(f"Warning: 'points' data not found or empty for stage {stage_number}.")
+        if 'youth' in full_stage_data and isinstance(full_stage_data['youth'], list) and full_stage_data['youth']:
+            extracted_data['top_youth_rider'] = extract_top_rider_info(full_stage_data['youth'][0])
+        else:
+            extracted_data['top_youth_rider'] = None
+            print(f"Warning: 'youth' data not found or empty for stage {stage_number}.")
+        if 'combative_rider' in full_stage_data and full_stage_data['combative_rider']:
+            combative_rider_data = full_stage_data['combative_rider']
+            if isinstance(combative_rider_data, dict):
+                name_to_format = combative_rider_data.get('rider_name')
+                rank = combative_rider_data.get('rank', 1)
             else:
-                extracted_data['combative_rider'] = None
-                print(f"Warning: 'combative_rider' data not found for stage {stage_number}.")
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(extracted_data, f, ensure_ascii=False, indent=4)
-            print(f"Successfully extracted and saved specific data for Tour de France 2025 Stage {stage_number} to {filepath}")
-        except Exception as e:
-            print(f"Error scraping stage {stage_number}: {e}")
-            continue
+                name_to_format = combative_rider_data
+                rank = 1
+            extracted_data['combative_rider'] = {
+                "rider_name": reformat_rider_name(name_to_format),
+                "rank": rank
+            }
+        else:
+            extracted_data['combative_rider'] = None
+            print(f"Warning: 'combative_rider' data not found for stage {stage_number}.")
+        
+        payload = json.dumps(extracted_data, ensure_ascii=False, indent=4)
+        # Re-scraping finished stages usually yields identical data; skip rewriting those files
+        if os.path.exists(filepath):
+            with open(filepath, 'r', encoding='utf-8') as f:
+                if f.read() == payload:
+                    print(f"Stage {stage_number} unchanged, keeping existing file {filepath}")
+                    return
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        print(f"Successfully extracted and saved specific data for Tour de France 2025 Stage {stage_number} to {filepath}")
+    except Exception as e:
+        print(f"Error scraping stage {stage_number}: {e}")
+
+def scrape_all_stages(up_to_stage):
+    os.makedirs(STAGE_DATA_DIR, exist_ok=True)
+    print(f"Ensured output directory exists: {STAGE_DATA_DIR}")
+    # Stages are independent and scraping is network-bound, so overlap the requests
+    with ThreadPoolExecutor(max_workers=MAX_SCRAPE_WORKERS) as executor:
+        list(executor.map(scrape_stage, range(1, up_to_stage + 1)))
 
 if __name__ == "__main__":
     scrape_all_stages(current_stage_number)
\ No newline at end of file
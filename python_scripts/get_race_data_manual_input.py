@@ -26,6 +26,12 @@ def create_stage_template():
         "combative_rider": None
     }
 
+def save_stage_data(stage_data, filepath):
+    """Serializes stage data in memory and writes it to disk in a single call."""
+    payload = json.dumps(stage_data, ensure_ascii=False, indent=4)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(payload)
+
 def add_dnf_rider_interactive():
     """Prompts user to add a DNF rider and returns the dictionary."""
     print("\n--- Add DNF/DNS/OTL/DSQ Rider ---")
@@ -96,8 +102,7 @@ def manual_entry_simplified(stage_number):
     
     # Save the file
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(stage_data, f, ensure_ascii=False, indent=4)
+        save_stage_data(stage_data, filepath)
         
         print(f"\n{'='*50}")
         print(f"✓ Stage {stage_number} saved to: {filepath}")
@@ -125,8 +130,7 @@ def quick_dnf_entry(stage_number, dnf_riders_list):
             "status": "DNF"
         })
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(stage_data, f, ensure_ascii=False, indent=4)
+    save_stage_data(stage_data, filepath)
     
     print(f"✓ Stage {stage_number} created with {len(dnf_riders_list)} DNF riders")
     return filepath
@@ -1,5 +1,6 @@
 import json
 import os
+from collections import Counter
 
 # Switch to control anonymization
 ANONYMIZE = True  # Set to False to keep original names
@@ -57,9 +58,10 @@ def validate_participant_data(data):
         if reserve_rider:
             participant_riders.append(reserve_rider)
         
-        if len(participant_riders) != len(set(participant_riders)):
-            duplicates = [r for r in participant_riders if participant_riders.count(r) > 1]
-            errors.append(f"{participant_name}: Duplicate riders in selection: {set(duplicates)}")
+        rider_counts = Counter(participant_riders)
+        duplicates = {rider for rider, count in rider_counts.items() if count > 1}
+        if duplicates:
+            errors.append(f"{participant_name}: Duplicate riders in selection: {duplicates}")
         
         # Check for riders selected by multiple participants
         for rider in participant_riders:
@@ -122,9 +124,10 @@ def process_tourpoule_data(input_filepath, output_filepath):
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        # Write processed data
+        # Write processed data (serialized in memory, then written in a single call)
+        payload = json.dumps(processed_data, indent=4, ensure_ascii=False)
         with open(output_filepath, 'w', encoding='utf-8') as f:
-            json.dump(processed_data, f, indent=4, ensure_ascii=False)
+            f.write(payload)
         
         print(f"✓ Saved processed data to: {output_filepath}")
         
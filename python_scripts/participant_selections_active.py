@@ -2,17 +2,38 @@ import json
 import os
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library
+    orjson = None
+
 # --- Configuration ---
 DATA_DIR = 'data'
 STAGE_RESULTS_DIR = os.path.join(DATA_DIR, 'stage_results')
 INITIAL_TEAMS_FILE = os.path.join(DATA_DIR, 'participant_selections_anon.json')
 OUTPUT_FILE = os.path.join(DATA_DIR, 'team_selections_active.json')
 
+def load_json_data(filepath):
+    """Load JSON data from a file, using orjson when available."""
+    if orjson is not None:
+        with open(filepath, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_json_data(data, filepath):
+    """Save data as 2-space indented JSON, using orjson when available."""
+    if orjson is not None:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
 def load_initial_selections():
     """Load and preprocess initial participant selections."""
     try:
-        with open(INITIAL_TEAMS_FILE, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
+        raw_data = load_json_data(INITIAL_TEAMS_FILE)
         
         participants = []
         for participant in raw_data:
@@ -43,8 +64,7 @@ def load_stage_results(stage_num):
     """Load stage results, return None if not found."""
     stage_filepath = os.path.join(STAGE_RESULTS_DIR, f'stage_{stage_num}.json')
     try:
-        with open(stage_filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_json_data(stage_filepath)
     except FileNotFoundError:
         return None
     except json.JSONDecodeError as e:
@@ -82,9 +102,8 @@ def process_stage_substitutions(participants, stage_num, dnf_riders):
             'substitution_made': None
         }
         
-        # Remove DNF riders
-        for dnf_rider in dnf_from_team:
-            active_riders.remove(dnf_rider)
+        # Remove DNF riders in a single pass (set lookups instead of repeated list.remove)
+        active_riders[:] = [rider for rider in active_riders if rider not in dnf_riders]
         
         # Attempt substitution for the first lost rider (if reserve available and not already used)
         if dnf_from_team and reserve_rider and not participant['has_substituted']:
@@ -206,8 +225,7 @@ def manage_rosters(up_to_stage_number):
     
     # Save to single output file
     try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
+        save_json_data(output_data, OUTPUT_FILE)
         
         print(f"\n{'='*50}")
         print(f"✓ Team selection tracking saved to: {OUTPUT_FILE}")